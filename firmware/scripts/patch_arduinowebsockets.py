@@ -13,6 +13,8 @@ Patches applied:
    when no CA cert is provided. This adds setInsecure() to SecuredEsp32TcpClient
    and calls it automatically when no CA cert is configured (matching ESP8266's
    existing behavior).
+
+Files are only rewritten when a patch is actually applied.
 """
 
 Import("env")
@@ -22,73 +24,82 @@ libdeps = env.subst("$PROJECT_LIBDEPS_DIR")
 pioenv  = env.subst("$PIOENV")
 ws_base = os.path.join(libdeps, pioenv, "ArduinoWebsockets", "src")
 
+
+def patch_file(path, old, new, marker):
+    """Replace the first `old` with `new` in `path`, working on raw bytes.
+    `marker` is a byte string only present once the patch is applied, so
+    already-patched files cost a single read on every later build.
+    Sources checked out with CRLF endings are matched (and patched) in
+    their CRLF form.
+    Returns "patched", "already", "missing" (old not found) or "nofile"."""
+    if not os.path.exists(path):
+        return "nofile"
+    with open(path, "rb") as f:
+        data = f.read()
+    if marker in data:
+        return "already"
+    i = data.find(old)
+    if i < 0 and b"\r\n" in data:
+        old = old.replace(b"\n", b"\r\n")
+        new = new.replace(b"\n", b"\r\n")
+        i = data.find(old)
+    if i < 0:
+        return "missing"
+    with open(path, "wb") as f:
+        f.write(data[:i] + new + data[i + len(old):])
+    return "patched"
+
+
 # -- Patch 1: Connection timeout --
-ws_config = os.path.join(ws_base, "tiny_websockets", "ws_config_defs.hpp")
-if os.path.exists(ws_config):
-    with open(ws_config, "r") as f:
-        content = f.read()
-    if "_CONNECTION_TIMEOUT 1000" in content:
-        content = content.replace("_CONNECTION_TIMEOUT 1000", "_CONNECTION_TIMEOUT 5000")
-        with open(ws_config, "w") as f:
-            f.write(content)
-        print("[patch] ws_config_defs.hpp: _CONNECTION_TIMEOUT 1000 -> 5000")
-    else:
-        print("[patch] ws_config_defs.hpp: timeout already patched")
-else:
-    print("[patch] ws_config_defs.hpp: not found, skipping")
+status = patch_file(
+    os.path.join(ws_base, "tiny_websockets", "ws_config_defs.hpp"),
+    b"_CONNECTION_TIMEOUT 1000",
+    b"_CONNECTION_TIMEOUT 5000",
+    marker=b"_CONNECTION_TIMEOUT 5000")
+print({
+    "patched": "[patch] ws_config_defs.hpp: _CONNECTION_TIMEOUT 1000 -> 5000",
+    "already": "[patch] ws_config_defs.hpp: timeout already patched",
+    "missing": "[patch] ws_config_defs.hpp: timeout define not found, skipping",
+    "nofile":  "[patch] ws_config_defs.hpp: not found, skipping",
+}[status])
 
 # -- Patch 2: Add setInsecure() to SecuredEsp32TcpClient --
-esp32_tcp = os.path.join(ws_base, "tiny_websockets", "network", "esp32", "esp32_tcp.hpp")
-if os.path.exists(esp32_tcp):
-    with open(esp32_tcp, "r") as f:
-        content = f.read()
-    if "void setInsecure()" not in content:
-        old = '''void setPrivateKey(const char* private_key) {
+old = b'''void setPrivateKey(const char* private_key) {
       this->client.setPrivateKey(private_key);
     }'''
-        new = old + '''
+new = old + b'''
 
     void setInsecure() {
       this->client.setInsecure();
     }'''
-        if old in content:
-            content = content.replace(old, new)
-            with open(esp32_tcp, "w") as f:
-                f.write(content)
-            print("[patch] esp32_tcp.hpp: added setInsecure() to SecuredEsp32TcpClient")
-        else:
-            print("[patch] esp32_tcp.hpp: setPrivateKey block not found, skipping")
-    else:
-        print("[patch] esp32_tcp.hpp: setInsecure() already present")
-else:
-    print("[patch] esp32_tcp.hpp: not found, skipping")
+status = patch_file(
+    os.path.join(ws_base, "tiny_websockets", "network", "esp32", "esp32_tcp.hpp"),
+    old, new, marker=b"void setInsecure()")
+print({
+    "patched": "[patch] esp32_tcp.hpp: added setInsecure() to SecuredEsp32TcpClient",
+    "already": "[patch] esp32_tcp.hpp: setInsecure() already present",
+    "missing": "[patch] esp32_tcp.hpp: setPrivateKey block not found, skipping",
+    "nofile":  "[patch] esp32_tcp.hpp: not found, skipping",
+}[status])
 
 # -- Patch 3: Call setInsecure() in upgradeToSecuredConnection() --
-ws_client = os.path.join(ws_base, "websockets_client.cpp")
-if os.path.exists(ws_client):
-    with open(ws_client, "r") as f:
-        content = f.read()
-    marker = "// [patch] match ESP8266 behavior"
-    if marker not in content:
-        old_block = '''if(this->_optional_ssl_private_key) {
+old_block = b'''if(this->_optional_ssl_private_key) {
             client->setPrivateKey(this->_optional_ssl_private_key);
         }
     #endif'''
-        new_block = '''if(this->_optional_ssl_private_key) {
+new_block = b'''if(this->_optional_ssl_private_key) {
             client->setPrivateKey(this->_optional_ssl_private_key);
         }
         if(!this->_optional_ssl_ca_cert) { // [patch] match ESP8266 behavior
             client->setInsecure();
         }
     #endif'''
-        if old_block in content:
-            content = content.replace(old_block, new_block)
-            with open(ws_client, "w") as f:
-                f.write(content)
-            print("[patch] websockets_client.cpp: added setInsecure() fallback for ESP32")
-        else:
-            print("[patch] websockets_client.cpp: target block not found, skipping")
-    else:
-        print("[patch] websockets_client.cpp: already patched")
-else:
-    print("[patch] websockets_client.cpp: not found, skipping")
+status = patch_file(
+    os.path.join(ws_base, "websockets_client.cpp"),
+    old_block, new_block, marker=b"// [patch] match ESP8266 behavior")
+print({
+    "patched": "[patch] websockets_client.cpp: added setInsecure() fallback for ESP32",
+    "already": "[patch] websockets_client.cpp: already patched",
+    "missing": "[patch] websockets_client.cpp: target block not found, skipping",
+    "nofile":  "[patch] websockets_client.cpp: not found, skipping",
+}[status])
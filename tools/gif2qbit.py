@@ -15,15 +15,19 @@ Usage:
   python gif2qbit.py *.gif
   python gif2qbit.py /path/to/gifs/
   python gif2qbit.py input.gif --threshold 100 --invert --scale stretch
+  python gif2qbit.py input.gif --filter quality
 """
 
 import argparse
+import functools
+import itertools
 import struct
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageSequence
 except ImportError:
     print("Error: Pillow is required.  Install with:  pip install Pillow")
     sys.exit(1)
@@ -31,60 +35,92 @@ except ImportError:
 DISPLAY_WIDTH  = 128
 DISPLAY_HEIGHT = 64
 FRAME_SIZE     = (DISPLAY_WIDTH // 8) * DISPLAY_HEIGHT  # 1024 bytes
+MAX_FRAMES     = 255   # frame_count is a uint8
+REDUCING_GAP   = 3.0   # integer reduce() pre-pass before the final resample
 
+# The output is hard-thresholded to 1 bit, so LANCZOS's sub-pixel accuracy
+# is mostly thrown away; BILINEAR is the cheaper default.
+FILTERS = {
+    "fast":    Image.BILINEAR,
+    "quality": Image.LANCZOS,
+}
 
-def frame_to_bitmap(gray_img, threshold=128, invert=False):
-    """Convert a DISPLAY_WIDTH x DISPLAY_HEIGHT grayscale image to a
-    monochrome bitmap (horizontal scan, MSB first).
+
+def threshold_lut(threshold=128, invert=False):
+    """Build the 256-entry point() table that maps grayscale straight to
+    bit ON (255) / OFF (0), with threshold and invert fused into one pass.
     Default polarity: dark pixel -> bit ON (matches gif2cpp inverted mode
     and the firmware's ~bitwise-NOT in gifRenderFrame)."""
-    pixels = gray_img.load()
-    bitmap = bytearray(FRAME_SIZE)
-
-    for y in range(DISPLAY_HEIGHT):
-        for x in range(DISPLAY_WIDTH):
-            bit_on = pixels[x, y] < threshold   # dark pixel -> bit ON
-            if invert:
-                bit_on = not bit_on
-            if bit_on:
-                byte_idx = y * (DISPLAY_WIDTH // 8) + (x // 8)
-                bit_idx  = 7 - (x % 8)
-                bitmap[byte_idx] |= (1 << bit_idx)
-
-    return bytes(bitmap)
-
-
-def resize_frame(img, scale="fit"):
+    on, off = (0, 255) if invert else (255, 0)
+    return bytes(on if i < threshold else off for i in range(256))
+
+
+def to_grayscale(img):
+    """Convert a GIF frame to grayscale ('L').
+    Only frames with real transparency are composited onto a black
+    background; opaque palette/RGB frames are converted directly."""
+    if "transparency" in img.info or img.mode in ("LA", "PA"):
+        img = img.convert("RGBA")
+    elif img.mode == "L":
+        return img
+    if img.mode == "RGBA":
+        if img.getchannel("A").getextrema()[0] == 255:
+            return img.convert("L")   # fully opaque, nothing to blend
+        bg = Image.new("RGBA", img.size, (0, 0, 0, 255))
+        img = Image.alpha_composite(bg, img)
+    return img.convert("L")
+
+
+def pick_filter(src_size, dst_size, filter_name="fast"):
+    """Return the Pillow resampling filter for a src -> dst resize.
+    In fast mode, shrinking by more than 2x on either axis uses BOX, which
+    is cheaper than BILINEAR and already anti-aliases by averaging."""
+    if filter_name == "fast" and (dst_size[0] < src_size[0] * 0.5 or
+                                  dst_size[1] < src_size[1] * 0.5):
+        return Image.BOX
+    return FILTERS[filter_name]
+
+
+def resize_frame(img, scale="fit", filter_name="fast", canvas=None):
     """Resize a PIL Image to DISPLAY_WIDTH x DISPLAY_HEIGHT using the
-    chosen scale mode.  Returns a grayscale ('L') image."""
-    if img.mode != "L":
-        # Composite RGBA onto black background, then convert to grayscale
-        if img.mode == "RGBA":
-            bg = Image.new("RGBA", img.size, (0, 0, 0, 255))
-            img = Image.alpha_composite(bg, img)
-        img = img.convert("L")
+    chosen scale mode.  Returns a grayscale ('L') image.
+    Large sources are first shrunk by an integer factor with reduce()
+    (cheap box averaging) so the final resample only sees a frame a few
+    times bigger than the display.
+    `canvas` may be a reusable DISPLAY_WIDTH x DISPLAY_HEIGHT black 'L'
+    image; all frames of one GIF share a size, so each paste covers exactly
+    the previous frame's region and the border stays black."""
+    img = to_grayscale(img)
 
     w, h = img.size
 
     if scale == "stretch":
-        return img.resize((DISPLAY_WIDTH, DISPLAY_HEIGHT), Image.LANCZOS)
+        size = (DISPLAY_WIDTH, DISPLAY_HEIGHT)
+        return img.resize(size, pick_filter(img.size, size, filter_name),
+                          reducing_gap=REDUCING_GAP)
 
     if scale == "fit_width":
         ratio  = DISPLAY_WIDTH / w
+        new_w  = DISPLAY_WIDTH
         new_h  = max(1, int(h * ratio))
-        resized = img.resize((DISPLAY_WIDTH, new_h), Image.LANCZOS)
     elif scale == "fit_height":
         ratio  = DISPLAY_HEIGHT / h
         new_w  = max(1, int(w * ratio))
-        resized = img.resize((new_w, DISPLAY_HEIGHT), Image.LANCZOS)
+        new_h  = DISPLAY_HEIGHT
     else:  # "fit" -- fit within bounds, maintain aspect ratio
         ratio  = min(DISPLAY_WIDTH / w, DISPLAY_HEIGHT / h)
         new_w  = max(1, int(w * ratio))
         new_h  = max(1, int(h * ratio))
-        resized = img.resize((new_w, new_h), Image.LANCZOS)
+    size    = (new_w, new_h)
+    resized = img.resize(size, pick_filter(img.size, size, filter_name),
+                         reducing_gap=REDUCING_GAP)
+
+    if resized.size == (DISPLAY_WIDTH, DISPLAY_HEIGHT):
+        return resized   # already fills the display, no canvas needed
 
     # Centre on a black canvas
-    canvas = Image.new("L", (DISPLAY_WIDTH, DISPLAY_HEIGHT), 0)
+    if canvas is None:
+        canvas = Image.new("L", (DISPLAY_WIDTH, DISPLAY_HEIGHT), 0)
     x_off  = (DISPLAY_WIDTH  - resized.width)  // 2
     y_off  = (DISPLAY_HEIGHT - resized.height) // 2
     canvas.paste(resized, (x_off, y_off))
@@ -92,7 +128,7 @@ def resize_frame(img, scale="fit"):
 
 
 def convert_gif(input_path, output_path=None, threshold=128,
-                invert=False, scale="fit"):
+                invert=False, scale="fit", filter_name="fast"):
     """Convert a GIF file to .qgif binary.  Returns True on success."""
     input_path = Path(input_path)
     if output_path is None:
@@ -106,44 +142,40 @@ def convert_gif(input_path, output_path=None, threshold=128,
         print(f"Error opening {input_path}: {exc}")
         return False
 
+    lut    = threshold_lut(threshold, invert)
+    canvas = Image.new("L", (DISPLAY_WIDTH, DISPLAY_HEIGHT), 0)
     frames = []
     delays = []
 
-    try:
-        while True:
-            delay = img.info.get("duration", 100)
-            if delay <= 0:
-                delay = 100
-            delays.append(delay)
+    total = getattr(img, "n_frames", 1)
+    if total > MAX_FRAMES:
+        print(f"Warning: {input_path} has {total} frames, "
+              f"truncating to {MAX_FRAMES}")
 
-            gray    = resize_frame(img.convert("RGBA"), scale)
-            bitmap  = frame_to_bitmap(gray, threshold, invert)
-            frames.append(bitmap)
+    # Frames past MAX_FRAMES would be dropped anyway, so never decode them
+    for frame in itertools.islice(ImageSequence.Iterator(img), MAX_FRAMES):
+        delay = frame.info.get("duration", 100)
+        if delay <= 0:
+            delay = 100
+        delays.append(delay)
 
-            img.seek(img.tell() + 1)
-    except EOFError:
-        pass
+        # A mode '1' image serialises to exactly the .qgif bitmap layout
+        # (horizontal scan, MSB first), so point() + tobytes() is the
+        # whole threshold-and-pack step.
+        gray = resize_frame(frame, scale, filter_name, canvas)
+        frames.append(gray.point(lut, "1").tobytes())
 
     frame_count = len(frames)
     if frame_count == 0:
         print(f"Error: no frames found in {input_path}")
         return False
-    if frame_count > 255:
-        print(f"Warning: {input_path} has {frame_count} frames, "
-              f"truncating to 255")
-        frames = frames[:255]
-        delays = delays[:255]
-        frame_count = 255
 
     # --- Write .qgif binary ---
+    header = struct.pack(f"<BHH{frame_count}H", frame_count,
+                         DISPLAY_WIDTH, DISPLAY_HEIGHT, *delays)
     with open(output_path, "wb") as f:
-        f.write(struct.pack("<B", frame_count))
-        f.write(struct.pack("<H", DISPLAY_WIDTH))
-        f.write(struct.pack("<H", DISPLAY_HEIGHT))
-        for d in delays:
-            f.write(struct.pack("<H", d))
-        for bitmap in frames:
-            f.write(bitmap)
+        f.write(header)
+        f.writelines(frames)   # no joined copy of all frame data
 
     total_kb = (5 + frame_count * 2 + frame_count * FRAME_SIZE) / 1024
     print(f"  {input_path.name}  ->  {output_path.name}  "
@@ -166,6 +198,9 @@ def main():
                         choices=["fit", "stretch", "fit_width", "fit_height"],
                         default="fit",
                         help="Scale mode (default: fit)")
+    parser.add_argument("--filter", choices=list(FILTERS), default="fast",
+                        help="Resampling filter: fast (BILINEAR/BOX) or "
+                             "quality (LANCZOS) (default: fast)")
     args = parser.parse_args()
 
     # Collect input files
@@ -188,10 +223,15 @@ def main():
         sys.exit(1)
 
     print(f"Converting {len(files)} file(s)...\n")
-    ok = sum(
-        convert_gif(f, args.output, args.threshold, args.invert, args.scale)
-        for f in files
-    )
+    convert = functools.partial(convert_gif, output_path=args.output,
+                                threshold=args.threshold, invert=args.invert,
+                                scale=args.scale, filter_name=args.filter)
+    if len(files) == 1:
+        ok = int(convert(files[0]))
+    else:
+        # Each file converts independently; spread them across all cores
+        with ProcessPoolExecutor() as ex:
+            ok = sum(ex.map(convert, files))
     print(f"\nDone: {ok}/{len(files)} converted successfully.")
 
 
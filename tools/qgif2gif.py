@@ -29,28 +29,21 @@ except ImportError:
     sys.exit(1)
 
 
+# Byte -> byte with every bit flipped, for a single bytes.translate() pass
+INVERT_BITS = bytes(255 - i for i in range(256))
+
+
 def bitmap_to_image(bitmap, width, height, invert=False):
     """Convert a monochrome bitmap (horizontal scan, MSB first) back to
     a grayscale PIL Image.
     Default polarity matches gif2qbit: bit ON -> dark pixel (0),
-    bit OFF -> white pixel (255)."""
-    img = Image.new("L", (width, height), 255)
-    pixels = img.load()
-    bytes_per_row = width // 8
-
-    for y in range(height):
-        for x in range(width):
-            byte_idx = y * bytes_per_row + (x // 8)
-            bit_idx = 7 - (x % 8)
-            bit_on = (bitmap[byte_idx] >> bit_idx) & 1
-
-            if invert:
-                bit_on = not bit_on
-
-            # bit ON -> dark pixel (0), bit OFF -> white pixel (255)
-            pixels[x, y] = 0 if bit_on else 255
-
-    return img
+    bit OFF -> white pixel (255).
+    The bitmap is already Pillow's packed mode '1' layout, so it is loaded
+    with frombytes() instead of being unpacked pixel by pixel."""
+    # Mode '1' treats a set bit as white, so flip for the default polarity
+    if not invert:
+        bitmap = bitmap.translate(INVERT_BITS)
+    return Image.frombytes("1", (width, height), bitmap).convert("L")
 
 
 def convert_qgif(input_path, output_path=None, invert=False, scale=1):
@@ -9,6 +9,7 @@ Example: python3 qgif2header.py sys_idle.qgif sys_idle.h sys_idle
 
 import sys
 import struct
+import binascii
 
 def main():
     if len(sys.argv) != 4:
@@ -48,60 +49,66 @@ def main():
         frames.append(frame)
         offset += frame_size
 
-    # Generate header
+    # Generate header (built in memory, written with a single call)
+    buf = []
+    buf.append(f"#ifndef {guard}\n")
+    buf.append(f"#define {guard}\n\n")
+    buf.append("#include <stdint.h>\n")
+    buf.append("#include <pgmspace.h>\n\n")
+
+    buf.append("// Definition of data structure for GIF\n")
+    buf.append("#ifndef ANIMATED_GIF_DEFINED\n")
+    buf.append("#define ANIMATED_GIF_DEFINED\n")
+    buf.append("typedef struct {\n")
+    buf.append("    const uint8_t frame_count;\n")
+    buf.append("    const uint16_t width;\n")
+    buf.append("    const uint16_t height;\n")
+    buf.append("    const uint16_t* delays;\n")
+    buf.append("    const uint8_t (* frames)[1024];\n")
+    buf.append("} AnimatedGIF;\n")
+    buf.append("#endif // ANIMATED_GIF_DEFINED\n\n")
+
+    FC = f"{prefix.upper()}_FRAME_COUNT"
+    W = f"{prefix.upper()}_WIDTH"
+    H = f"{prefix.upper()}_HEIGHT"
+
+    buf.append(f"#define {FC} {frame_count}\n")
+    buf.append(f"#define {W} {width}\n")
+    buf.append(f"#define {H} {height}\n\n")
+
+    # Delays array
+    delay_str = ", ".join(str(d) for d in delays)
+    buf.append(f"const uint16_t {prefix}_delays[{FC}] = {{{delay_str}}};\n\n")
+
+    # Frames array
+    buf.append(f"PROGMEM const uint8_t {prefix}_frames[{FC}][1024] = {{\n")
+    for fi, frame in enumerate(frames):
+        buf.append("  {\n")
+        # Hex-encode the whole frame in C once, then slice per 16-byte row
+        hex_frame = binascii.hexlify(frame).decode("ascii")
+        for row_start in range(0, len(frame), 16):
+            row = hex_frame[row_start * 2 : (row_start + 16) * 2]
+            pairs = [row[i : i + 2] for i in range(0, len(row), 2)]
+            hex_vals = "0x" + ", 0x".join(pairs)
+            comma = "," if row_start + 16 < len(frame) else ""
+            buf.append(f"    {hex_vals}{comma}\n")
+        comma = "," if fi < frame_count - 1 else ""
+        buf.append(f"  }}{comma}\n")
+    buf.append("};\n\n")
+
+    # AnimatedGIF struct instance
+    buf.append(f"const AnimatedGIF {prefix}_gif = {{\n")
+    buf.append(f"    {FC},\n")
+    buf.append(f"    {W},\n")
+    buf.append(f"    {H},\n")
+    buf.append(f"    {prefix}_delays,\n")
+    buf.append(f"    {prefix}_frames\n")
+    buf.append("};\n\n")
+
+    buf.append(f"#endif // {guard}\n")
+
     with open(outfile, "w") as out:
-        out.write(f"#ifndef {guard}\n")
-        out.write(f"#define {guard}\n\n")
-        out.write("#include <stdint.h>\n")
-        out.write("#include <pgmspace.h>\n\n")
-
-        out.write("// Definition of data structure for GIF\n")
-        out.write("#ifndef ANIMATED_GIF_DEFINED\n")
-        out.write("#define ANIMATED_GIF_DEFINED\n")
-        out.write("typedef struct {\n")
-        out.write("    const uint8_t frame_count;\n")
-        out.write("    const uint16_t width;\n")
-        out.write("    const uint16_t height;\n")
-        out.write("    const uint16_t* delays;\n")
-        out.write("    const uint8_t (* frames)[1024];\n")
-        out.write("} AnimatedGIF;\n")
-        out.write("#endif // ANIMATED_GIF_DEFINED\n\n")
-
-        FC = f"{prefix.upper()}_FRAME_COUNT"
-        W = f"{prefix.upper()}_WIDTH"
-        H = f"{prefix.upper()}_HEIGHT"
-
-        out.write(f"#define {FC} {frame_count}\n")
-        out.write(f"#define {W} {width}\n")
-        out.write(f"#define {H} {height}\n\n")
-
-        # Delays array
-        delay_str = ", ".join(str(d) for d in delays)
-        out.write(f"const uint16_t {prefix}_delays[{FC}] = {{{delay_str}}};\n\n")
-
-        # Frames array
-        out.write(f"PROGMEM const uint8_t {prefix}_frames[{FC}][1024] = {{\n")
-        for fi, frame in enumerate(frames):
-            out.write("  {\n")
-            for row_start in range(0, len(frame), 16):
-                chunk = frame[row_start : row_start + 16]
-                hex_vals = ", ".join(f"0x{b:02x}" for b in chunk)
-                comma = "," if row_start + 16 < len(frame) else ""
-                out.write(f"    {hex_vals}{comma}\n")
-            comma = "," if fi < frame_count - 1 else ""
-            out.write(f"  }}{comma}\n")
-        out.write("};\n\n")
-
-        # AnimatedGIF struct instance
-        out.write(f"const AnimatedGIF {prefix}_gif = {{\n")
-        out.write(f"    {FC},\n")
-        out.write(f"    {W},\n")
-        out.write(f"    {H},\n")
-        out.write(f"    {prefix}_delays,\n")
-        out.write(f"    {prefix}_frames\n")
-        out.write("};\n\n")
-
-        out.write(f"#endif // {guard}\n")
+        out.write("".join(buf))
 
     print(f"Generated {outfile} ({frame_count} frames, {width}x{height})")
 
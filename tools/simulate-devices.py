@@ -9,25 +9,46 @@ Usage:
   python simulate-devices.py -n 10 --host wss://qbit.labxcloud.com
   python simulate-devices.py -n 3 --host ws://localhost:3000 --key dev-test-key
   python simulate-devices.py -n 2 --auto-claim   # auto-confirm claim requests
+  python simulate-devices.py -n 1000 --concurrency 64
+
+All devices share a single asyncio event loop, so large counts (-n 1000)
+do not need one OS thread per connection.
 
 Requirements:
-  pip install websocket-client
+  pip install "websockets>=13"
+  pip install orjson        # optional, faster JSON for large device counts
 """
 
 import argparse
+import asyncio
 import json
 import random
 import signal
 import sys
-import threading
-import time
 
 try:
-    import websocket
+    # The asyncio client (and its additional_headers argument) needs >= 13
+    from websockets.asyncio.client import connect
 except ImportError:
-    print("Error: websocket-client is required.  Install with:  pip install websocket-client")
+    print('Error: websockets >= 13 is required.  Install with:  pip install "websockets>=13"')
     sys.exit(1)
 
+try:
+    import orjson
+
+    json_loads = orjson.loads
+
+    def json_dumps(obj):
+        # orjson emits bytes; decode so frames still go out as text
+        return orjson.dumps(obj).decode()
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+# Replies with a fixed payload are serialised once, not per message
+CLAIM_CONFIRM = json_dumps({"type": "claim_confirm"})
+FRIEND_CONFIRM = json_dumps({"type": "friend_confirm"})
+
 
 def make_device_id(index):
     """Generate a fake 12-char hex device ID."""
@@ -39,102 +60,135 @@ def make_device_name(device_id):
     return f"QBIT-{device_id[-4:]}"
 
 
-def handle_message(ws, device_id, device_name, msg_data, auto_claim, device_index):
+async def on_poke(ws, device_name, msg, auto_claim, device_index):
+    """Print a poke addressed to this device."""
+    sender = msg.get("sender", "?")
+    text = msg.get("text", "")
+    has_bitmap = bool(msg.get("senderBitmap"))
+    mode = "bitmap" if has_bitmap else "text"
+    print(f"  [!] {device_name}  poke ({mode}) from {sender}: {text}")
+
+
+async def on_broadcast(ws, device_name, msg, auto_claim, device_index):
+    """Print a network-wide broadcast (once, from device #0)."""
+    if device_index != 0:
+        return
+    sender = msg.get("sender", "QBIT Network")
+    text = msg.get("text", "")
+    print(f"  [!] broadcast from {sender}: {text}")
+
+
+async def on_claim_request(ws, device_name, msg, auto_claim, device_index):
+    """Log a claim request and confirm it with --auto-claim."""
+    user_name = msg.get("userName", "Unknown")
+    print(f"  [?] {device_name}  claim request from {user_name}", end="")
+    if auto_claim:
+        # Simulate a short delay (like a long-press) then confirm
+        print(" -> auto-confirming in 2s...")
+        await asyncio.sleep(2)
+        await ws.send(CLAIM_CONFIRM)
+        print(f"  [v] {device_name}  claim confirmed for {user_name}")
+    else:
+        print(" (ignored, use --auto-claim to accept)")
+
+
+async def on_friend_request(ws, device_name, msg, auto_claim, device_index):
+    """Log a friend request and confirm it with --auto-claim."""
+    user_name = msg.get("userName", "Unknown")
+    print(f"  [?] {device_name}  friend request from {user_name}", end="")
+    if auto_claim:
+        print(" -> auto-confirming in 2s...")
+        await asyncio.sleep(2)
+        await ws.send(FRIEND_CONFIRM)
+        print(f"  [v] {device_name}  friend added: {user_name}")
+    else:
+        print(" (ignored, use --auto-claim to accept)")
+
+
+# Message type -> handler; anything else is ignored
+HANDLERS = {
+    "poke": on_poke,
+    "broadcast": on_broadcast,
+    "claim_request": on_claim_request,
+    "friend_request": on_friend_request,
+}
+
+
+async def handle_message(ws, device_id, device_name, msg_data, auto_claim, device_index):
     """Process an incoming message from the backend."""
     try:
-        msg = json.loads(msg_data)
-    except (json.JSONDecodeError, TypeError):
+        msg = json_loads(msg_data)
+    except (ValueError, TypeError):
         return
 
-    msg_type = msg.get("type", "")
-
-    if msg_type == "poke":
-        sender = msg.get("sender", "?")
-        text = msg.get("text", "")
-        has_bitmap = bool(msg.get("senderBitmap"))
-        mode = "bitmap" if has_bitmap else "text"
-        print(f"  [!] {device_name}  poke ({mode}) from {sender}: {text}")
-
-    elif msg_type == "broadcast":
-        if device_index != 0:
-            return
-        sender = msg.get("sender", "QBIT Network")
-        text = msg.get("text", "")
-        print(f"  [!] broadcast from {sender}: {text}")
-
-    elif msg_type == "claim_request":
-        user_name = msg.get("userName", "Unknown")
-        print(f"  [?] {device_name}  claim request from {user_name}", end="")
-        if auto_claim:
-            # Simulate a short delay (like a long-press) then confirm
-            print(" -> auto-confirming in 2s...")
-            time.sleep(2)
-            ws.send(json.dumps({"type": "claim_confirm"}))
-            print(f"  [v] {device_name}  claim confirmed for {user_name}")
-        else:
-            print(" (ignored, use --auto-claim to accept)")
-
-    elif msg_type == "friend_request":
-        user_name = msg.get("userName", "Unknown")
-        print(f"  [?] {device_name}  friend request from {user_name}", end="")
-        if auto_claim:
-            print(" -> auto-confirming in 2s...")
-            time.sleep(2)
-            ws.send(json.dumps({"type": "friend_confirm"}))
-            print(f"  [v] {device_name}  friend added: {user_name}")
-        else:
-            print(" (ignored, use --auto-claim to accept)")
-
-
-def device_thread(index, url, stop_event, auto_claim, api_key):
-    """Run a single simulated device connection."""
+    handler = HANDLERS.get(msg.get("type", ""))
+    if handler:
+        await handler(ws, device_name, msg, auto_claim, device_index)
+
+
+async def device_task(index, url, auto_claim, api_key, connect_sem):
+    """Run a single simulated device connection until cancelled.
+    connect_sem bounds how many handshakes are in flight at once."""
     device_id = make_device_id(index)
     device_name = make_device_name(device_id)
 
-    register_msg = json.dumps({
+    register_msg = json_dumps({
         "type": "device.register",
         "id": device_id,
         "name": device_name,
         "ip": f"192.168.1.{100 + index}",
         "version": "SIM",
     })
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
 
-    while not stop_event.is_set():
-        ws = None
-        try:
-            ws = websocket.WebSocket()
-            ws.settimeout(10)
-            headers = []
-            if api_key:
-                headers.append(f"Authorization: Bearer {api_key}")
-            ws.connect(url, header=headers)
-            ws.send(register_msg)
-            print(f"  [+] #{index:>3d}  {device_id}  {device_name}")
-
-            # Stay connected, handle incoming messages
-            while not stop_event.is_set():
-                ws.settimeout(5)
-                try:
-                    data = ws.recv()
-                    if data:
-                        handle_message(ws, device_id, device_name, data, auto_claim, index)
-                except websocket.WebSocketTimeoutException:
-                    continue
-                except Exception:
-                    break
-
-        except Exception:
-            if not stop_event.is_set():
+    try:
+        while True:
+            try:
+                # Hold a slot only for the handshake, not the whole session
+                async with connect_sem:
+                    ws = await connect(url, additional_headers=headers,
+                                       open_timeout=10)
+                async with ws:
+                    await ws.send(register_msg)
+                    print(f"  [+] #{index:>3d}  {device_id}  {device_name}")
+
+                    # Stay connected, handle incoming messages as they arrive
+                    try:
+                        async for data in ws:
+                            await handle_message(ws, device_id, device_name,
+                                                 data, auto_claim, index)
+                    except asyncio.CancelledError:
+                        await ws.close()  # normal closure, not 1011
+                        raise
+            except Exception:
                 # Retry after a short delay
-                time.sleep(2)
-        finally:
-            if ws:
-                try:
-                    ws.close()
-                except Exception:
-                    pass
+                await asyncio.sleep(2)
+    finally:
+        print(f"  [-] #{index:>3d}  {device_id}  {device_name}")
 
-    print(f"  [-] #{index:>3d}  {device_id}  {device_name}")
+
+async def run(count, url, auto_claim, api_key, concurrency):
+    """Start all devices and keep them online until SIGINT/SIGTERM."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C surfaces as KeyboardInterrupt instead
+
+    connect_sem = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(device_task(i, url, auto_claim, api_key,
+                                             connect_sem))
+             for i in range(count)]
+    try:
+        await stop_event.wait()
+    finally:
+        print("\n\nDisconnecting all devices...")
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        print("Done.")
 
 
 def main():
@@ -147,7 +201,11 @@ def main():
                         help="Device API key (must match backend DEVICE_API_KEY)")
     parser.add_argument("--auto-claim", action="store_true",
                         help="Automatically confirm claim requests (simulates long-press)")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Max simultaneous connection handshakes (default: 32)")
     args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
 
     path = "/device"
     url = args.host.rstrip("/") + path
@@ -157,31 +215,11 @@ def main():
         print("Auto-claim: ON (claim requests will be confirmed after 2s)")
     print("Press Ctrl+C to disconnect all and exit.\n")
 
-    stop_event = threading.Event()
-    threads = []
-
-    for i in range(args.count):
-        t = threading.Thread(target=device_thread,
-                             args=(i, url, stop_event, args.auto_claim, args.key),
-                             daemon=True)
-        t.start()
-        threads.append(t)
-        time.sleep(0.05)  # slight stagger to avoid connection burst
-
-    def shutdown(sig=None, frame=None):
-        print("\n\nDisconnecting all devices...")
-        stop_event.set()
-        for t in threads:
-            t.join(timeout=5)
-        print("Done.")
-        sys.exit(0)
-
-    signal.signal(signal.SIGINT, shutdown)
-    signal.signal(signal.SIGTERM, shutdown)
-
-    # Keep main thread alive
-    while True:
-        time.sleep(1)
+    try:
+        asyncio.run(run(args.count, url, args.auto_claim, args.key,
+                        args.concurrency))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":